@@ -3,6 +3,7 @@
 """Extractor service."""
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from os.path import join, split
 from typing import Union
 from . import parsers
@@ -35,6 +36,7 @@ class Extractor(Service):
 	_cfg: dict = None
 	_table: db.Table = None
 	_template_map: dict = None
+	_keyword_indexes: dict = None
 	_converters: dict = {}
 	_database = None
 	_account = None
@@ -74,6 +76,10 @@ class Extractor(Service):
 
 		g_log.info("Loading document templates ...")
 		self._template_map = self._load_templates()
+		self._keyword_indexes = {
+			customer: parsers.KeywordIndex(templates)
+			for customer, templates in self._template_map.items()
+		}
 		g_log.info("Templates loaded.")
 
 		g_log.info("Initializing converters ...")
@@ -100,30 +106,36 @@ class Extractor(Service):
 			APP_ROOT, "engine", "claim",
 			"Services", "extractor", "templates")
 
-		for subf in os.listdir(templates_dir):
+		# template files are read and compiled concurrently,
+		# the results are then collected in the order of listing
+		with ThreadPoolExecutor() as executor:
 
-			templates = []
-			subf_dir = Directory(join(templates_dir, subf))
+			for subf in os.listdir(templates_dir):
 
-			for tpl_path in subf_dir.list_dir(ext = ".yml"):
+				templates = []
+				subf_dir = Directory(join(templates_dir, subf))
+				tpl_paths = subf_dir.list_dir(ext = ".yml")
+				loadings = [executor.submit(parsers.create_template, path) for path in tpl_paths]
 
-				g_log.debug(f"Loading template: '{File(tpl_path).fullname}' ...")
+				for tpl_path, loading in zip(tpl_paths, loadings):
 
-				try:
-					template = parsers.create_template(tpl_path)
-				except Exception as exc:
-					g_log.error(str(exc))
-					continue
+					g_log.debug(f"Loading template: '{File(tpl_path).fullname}' ...")
+
+					try:
+						template = loading.result()
+					except Exception as exc:
+						g_log.error(str(exc))
+						continue
 
-				template_id = template["template_id"]
+					template_id = template["template_id"]
 
-				if template_id in used_tpl_codes:
-					raise RuntimeError(f"The tempate code '{template_id}' already used!")
+					if template_id in used_tpl_codes:
+						raise RuntimeError(f"The tempate code '{template_id}' already used!")
 
-				used_tpl_codes.append(template_id)
-				templates.append(template)
+					used_tpl_codes.append(template_id)
+					templates.append(template)
 
-			templ_map.update({subf: templates})
+				templ_map.update({subf: templates})
 
 		return templ_map
 
@@ -162,15 +174,28 @@ class Extractor(Service):
 
 		return pdf_paths
 
-	def _extract_data(self, txt_path: str, extracted_str: str, templates: list) -> dict:
+	def _extract_data(
+			self, txt_path: str, extracted_str: str,
+			templates: list, kwd_index: parsers.KeywordIndex) -> dict:
 		"""Extract relevant data from the text of a document."""
 
+		# templates with the same input options produce the same text, so the
+		# text is scanned and each keyword is searched only once for all of them
+		kwd_hits = {}
+		kwd_cache = {}
+
 		g_log.info("Matching data with templates ...")
 		for tmpl in templates:
 
 			optimized_str = tmpl.prepare_input(extracted_str)
 
-			if not tmpl.matches_keywords(optimized_str):
+			if optimized_str not in kwd_hits:
+				kwd_hits[optimized_str] = kwd_index.scan(optimized_str)
+				kwd_cache[optimized_str] = {}
+
+			if not tmpl.matches_keywords(
+					optimized_str, kwd_hits[optimized_str],
+					kwd_cache[optimized_str]):
 				continue
 
 			g_log.info("Matched template with ID: '%s'", tmpl["template_id"])
@@ -326,7 +351,9 @@ class Extractor(Service):
 
 			try:
 
-				data = self._extract_data(txt_path, extracted_str, templates)
+				data = self._extract_data(
+					txt_path, extracted_str, templates,
+					self._keyword_indexes[customer])
 				data["category"] = self._identify_category(msg_categ, data)
 
 				g_log.info("Writing data to JSON ...")
@@ -2,19 +2,314 @@
 
 """Base module for data parsers."""
 
+import logging
 import math
 import re
+import sys
 from abc import ABC, abstractmethod
-from collections import OrderedDict
 from datetime import date, datetime
-from os.path import basename, splitext
-from typing import Union
+from functools import lru_cache
+from os.path import abspath, basename, getmtime, splitext
+from typing import Callable, Union
+import ahocorasick
+import numpy as np
 import yaml
+from numba import njit
 from .... import logger
 
+try:
+	from yaml import CSafeLoader
+except ImportError:
+	from yaml import SafeLoader as CSafeLoader
+
+try:
+	from re import _parser as sre_parse
+except ImportError: # python < 3.11
+	import sre_parse # pylint: disable = W4901
+
+try:
+	import re2
+except ImportError: # the RE2 engine is optional
+	re2 = None
+
 d_log = logger.get_logger("document")
 g_log = logger.get_global_logger()
 
+# runs of whitespace removed from the document text by the 'remove_whitespace' option
+_RX_WHITESPACE_RUN = re.compile(r"\s{2,}")
+
+# global inline flags (e.g. '(?i)') that start a regex pattern
+_RX_GLOBAL_FLAGS = re.compile(r"(?:\(\?[aiLmsux]+\))*")
+
+@njit(cache = True)
+def _hornbach_gross(
+		n_inv: np.ndarray, n_del: np.ndarray, amt_inv: np.ndarray,
+		amt_ord: np.ndarray, tax: np.ndarray) -> float:
+	"""Calculates the total gross amount of Hornbach document items."""
+
+	amt_inv = np.where(amt_inv == amt_ord, 0.0, amt_inv)
+
+	return ((n_inv - n_del) * (amt_inv + amt_ord) * (1 + tax / 100)).sum()
+
+# compile the kernel at import so that the first document doesn't pay for it
+_hornbach_gross(
+	np.zeros(1, np.int64), np.zeros(1, np.int64),
+	np.zeros(1), np.zeros(1), np.zeros(1))
+
+# record layout of parsed Markant document items
+_MARKANT_ITEM = np.dtype([
+	("doc_diff", np.float64),
+	("pcs_ordered", np.int64),
+	("pcs_delivered", np.int64),
+	("price_ordered", np.float64),
+	("price_delivered", np.float64),
+])
+
+@njit(cache = True)
+def _markant_diffs(items: np.ndarray) -> np.ndarray:
+	"""Calculates the price and quantity differences of Markant document items."""
+
+	calc_diffs = np.empty(items.shape[0])
+
+	for i in range(items.shape[0]):
+
+		item = items[i]
+		pcs_o = item.pcs_ordered
+		pcs_d = item.pcs_delivered
+		price_o = item.price_ordered
+		price_d = item.price_delivered
+
+		if pcs_o == 0 and pcs_d == 0 and price_d == 0 and price_o == 0:
+			calc_diffs[i] = item.doc_diff
+		elif pcs_o == 0 and pcs_d == 0:
+			calc_diffs[i] = price_d - price_o
+		elif price_d == 0 and price_o == 0:
+			calc_diffs[i] = item.doc_diff
+		elif pcs_o == pcs_d:
+			calc_diffs[i] = (price_d - price_o) * pcs_o
+		elif price_d == price_o:
+			calc_diffs[i] = (pcs_o - pcs_d) * price_o
+		else:
+			calc_diffs[i] = (pcs_o - pcs_d) * (price_d - price_o)
+
+	return calc_diffs
+
+# compile the kernel at import so that the first document doesn't pay for it
+_markant_diffs(np.zeros(1, _MARKANT_ITEM))
+
+def _walk_regex_tree(walk: Callable, patt: str, flags: int, default: object) -> object:
+	"""
+	Parses a regex pattern with the internal parser of the 're' module and
+	returns the result of `walk()` called on the parse tree. The parse tree
+	is an undocumented structure (checked against CPython 3.8 - 3.13), so
+	if parsing or walking it fails for any reason, `default` is returned.
+	"""
+
+	try:
+		parsed = sre_parse.parse(patt, flags)
+		if parsed.state.flags & re.IGNORECASE:
+			return default
+		return walk(parsed)
+	except Exception: # pylint: disable = W0703
+		return default
+
+def _get_literal_hint(patt: re.Pattern) -> str:
+	"""
+	Returns the longest substring that must be present in
+	a text for the pattern to match. If there's no such
+	substring, then an empty string is returned.
+	"""
+
+	def walk(parsed) -> str:
+		"""Returns the longest run of literal characters in the parse tree."""
+
+		literals = []
+
+		def collect(subpattern) -> None:
+			"""Collects runs of literal characters in a sequence of pattern nodes."""
+
+			# pylint: disable = E1101
+			chars = []
+
+			for opcode, arg in subpattern:
+				if opcode is sre_parse.LITERAL:
+					chars.append(chr(arg))
+					continue
+
+				literals.append("".join(chars))
+				chars = []
+
+				# content of a group is mandatory unless case is ignored inside the group
+				if opcode is sre_parse.SUBPATTERN and not arg[1] & re.IGNORECASE:
+					collect(arg[-1])
+
+			literals.append("".join(chars))
+
+		collect(parsed)
+
+		return max(literals, key = len)
+
+	return _walk_regex_tree(walk, patt.pattern, getattr(patt, "flags", 0), "")
+
+def _classify_number(val: str) -> str:
+	"""
+	Classifies a value by the shape of the number it represents.
+
+	Returns 'int' for values shaped as '<digits>,ddd' (quantities),
+	'float' for values starting with '<digits>,dd' (prices, amounts)
+	and None for any other value.
+	"""
+
+	idx = val.find(",")
+
+	if idx <= 0 or not val[:idx].isdecimal():
+		return None
+
+	tail = val[idx + 1:]
+
+	if len(tail) == 3 and tail.isdecimal():
+		return "int"
+
+	if len(tail) >= 2 and tail[:2].isdecimal():
+		return "float"
+
+	return None
+
+def _get_literal_prefix(patt: re.Pattern) -> str:
+	"""
+	Returns the literal substring a pattern starts with.
+	If the pattern doesn't start with a literal, then an
+	empty string is returned.
+	"""
+
+	def walk(parsed) -> str:
+		"""Returns the literal characters the parse tree starts with."""
+
+		# pylint: disable = E1101
+		chars = []
+
+		for opcode, arg in parsed:
+			if opcode is not sre_parse.LITERAL:
+				break
+			chars.append(chr(arg))
+
+		return "".join(chars)
+
+	return _walk_regex_tree(walk, patt.pattern, getattr(patt, "flags", 0), "")
+
+def _get_literal_expansion(kwd: str, limit: int = 64) -> Union[list,None]:
+	"""
+	Returns the plain strings matched by a keyword pattern,
+	e.g. ['BAHAG', 'Bahag'] for 'BAHAG|Bahag'. If the pattern
+	doesn't match a small set of plain strings only, then
+	`None` is returned.
+	"""
+
+	def expand(subpattern) -> Union[list,None]:
+		"""Expands a sequence of pattern nodes into the strings it matches."""
+
+		# pylint: disable = E1101
+		strings = [""]
+
+		for opcode, arg in subpattern:
+			if opcode is sre_parse.LITERAL:
+				alts = [chr(arg)]
+			elif opcode is sre_parse.IN and all(op is sre_parse.LITERAL for op, _ in arg):
+				alts = [chr(char) for _, char in arg]
+			elif opcode is sre_parse.BRANCH:
+				alts = []
+				for branch in arg[1]:
+					branch_strings = expand(branch)
+					if branch_strings is None:
+						return None
+					alts.extend(branch_strings)
+			elif opcode is sre_parse.SUBPATTERN and not arg[1] & re.IGNORECASE:
+				alts = expand(arg[-1])
+				if alts is None:
+					return None
+			else:
+				return None
+
+			strings = [prefix + alt for prefix in strings for alt in alts]
+
+			if len(strings) > limit:
+				return None
+
+		return strings
+
+	strings = _walk_regex_tree(expand, kwd, 0, None)
+
+	if strings is None or "" in strings:
+		return None
+
+	return strings
+
+def _compile_re2(patt: str) -> object:
+	"""
+	Compiles a regex pattern using the RE2 engine. Patterns containing
+	syntax not supported by RE2 (e.g. lookarounds) are compiled using
+	the 're' module. The 're' module is also used if RE2 isn't installed.
+	"""
+
+	if re2 is None:
+		return re.compile(patt)
+
+	opts = re2.Options()
+	opts.log_errors = False
+
+	try:
+		return re2.compile(patt, opts)
+	except re2.error:
+		return re.compile(patt)
+
+@lru_cache(maxsize = 8192)
+def _strptime(val: str, fmt: str) -> datetime:
+	"""
+	Parses a date string into a datetime object. The results are cached
+	since the same dates tend to repeat across documents.
+	"""
+	return datetime.strptime(val, fmt)
+
+class KeywordIndex:
+	"""
+	Aho-Corasick automaton over the plain string keywords of
+	a group of templates. Scanning a document text once tells
+	which of the keywords the text contains.
+	"""
+
+	__slots__ = ("_automaton",)
+
+	def __init__(self, templates: list) -> None:
+		"""Constructor of class: `KeywordIndex`."""
+
+		self._automaton = ahocorasick.Automaton()
+
+		for tpl in templates:
+			for literal in tpl.keyword_literals:
+				self._automaton.add_word(literal, literal)
+
+		if len(self._automaton) != 0:
+			self._automaton.make_automaton()
+
+	def scan(self, text: str) -> frozenset:
+		"""Returns the indexed keywords contained in a text."""
+
+		if len(self._automaton) == 0:
+			return frozenset()
+
+		return frozenset(literal for _, literal in self._automaton.iter(text))
+
+def _classify_return_value(val: str) -> str:
+	"""
+	Classifies a value of an Obi return document item. Returns 'int'
+	for article numbers (LAR), otherwise see `_classify_number()`.
+	"""
+
+	if val.isnumeric():
+		return "int"
+
+	return _classify_number(val)
+
 class PatternMatchError(Exception):
 	"""Unmatched or mismatched regex pattern(s) for a mandatory field."""
 
@@ -24,6 +319,8 @@ class TemplateNotFoundError(Exception):
 class CompositeParser(ABC):
 	"""Parsing of composite data types."""
 
+	__slots__ = ()
+
 	def _fill_missing(self, item) -> list:
 		"""Fills missing numerical values."""
 		return [v.replace("", "0,00") if v == "" else v for v in item]
@@ -59,6 +356,8 @@ class CompositeParser(ABC):
 class PrimitiveParser(ABC):
 	"""Parsing of primitive data types."""
 
+	__slots__ = ()
+
 	@abstractmethod
 	def parse_number(
 			self, val: str, coerce: str = None
@@ -76,16 +375,62 @@ class PrimitiveParser(ABC):
 class Parser(PrimitiveParser):
 	"""Base class for document data parsers."""
 
-	def parse_numbers(self, vals: Union[list,tuple], coerce: str = None) -> list:
+	__slots__ = ()
+
+	def parse_numbers(
+			self, vals: Union[list,tuple], coerce: str = None,
+			errors: str = "raise") -> list:
 		"""..."""
 
-		result = []
+		if len(vals) >= 8 and coerce in ("int", "float"):
+			parsed = self._parse_numbers_vectorized(vals, coerce)
+			if parsed is not None:
+				return parsed
 
-		for val in vals:
-			parsed = self.parse_number(val, coerce)
-			result.append(parsed)
+		parse_number = self.parse_number
 
-		return result
+		return [parse_number(val, coerce, errors) for val in vals]
+
+	def _parse_numbers_vectorized(
+			self, vals: Union[list,tuple],
+			coerce: str) -> Union[list,None]:
+		"""
+		Converts string amounts into numbers in a single pass over
+		all values. The conversion rules are those of `parse_number()`.
+
+		If any of the values isn't a valid numeric string, then `None`
+		is returned and the values should be parsed one by one so that
+		the errors are handled by `parse_number()`.
+		"""
+
+		if not all(isinstance(val, str) for val in vals):
+			return None
+
+		arr = np.char.replace(np.array(vals, dtype = str), " ", "")
+		negative = np.char.find(arr, "-") != -1
+		arr = np.char.strip(arr, "-")
+
+		# number of decimals is given by the digits after the last separator
+		sep_pos = np.maximum(np.char.rfind(arr, "."), np.char.rfind(arr, ","))
+		decimals = np.where(sep_pos == -1, 0, np.char.str_len(arr) - sep_pos - 1)
+
+		digits = np.char.replace(np.char.replace(arr, ".", ""), ",", "")
+
+		# values exceeding the exact range of a float are left to the scalar path
+		if not np.char.isnumeric(digits).all() or np.char.str_len(digits).max() > 15:
+			return None
+
+		parsed = digits.astype(np.int64) / np.power(10.0, decimals)
+		parsed = np.where(negative, -parsed, parsed)
+
+		# integers are negated before they're converted to floats,
+		# so there's no negative zero for values without decimals
+		parsed = np.where(decimals == 0, parsed + 0.0, parsed)
+
+		if coerce == "int":
+			return np.trunc(parsed).astype(np.int64).tolist()
+
+		return parsed.tolist()
 
 	def parse_number(
 			self, val: str, coerce: str = None,
@@ -160,12 +505,11 @@ class Parser(PrimitiveParser):
 
 		repl = val.replace(" ", "")
 		repl = repl.strip("-")
-		decimals = 0
 
 		# some documents contain amouts rounded
 		# to 4 decimal places instead of 2
-		if re.search(r"\D", repl) is not None:
-			decimals = len(re.split(r"\D", repl)[-1])
+		sep_pos = max(repl.rfind("."), repl.rfind(","))
+		decimals = 0 if sep_pos == -1 else len(repl) - sep_pos - 1
 
 		# some documents contian amouts rounded
 		# to 4 decimal places instead of 2
@@ -228,7 +572,7 @@ class Parser(PrimitiveParser):
 				"Could not parse the vlaue! Expected "
 				f"value type was 'str', but got '{val}'.")
 
-		parsed = datetime.strptime(val, fmt)
+		parsed = _strptime(val, fmt)
 
 		if target_type == "date":
 			res = parsed.date()
@@ -242,19 +586,24 @@ class Parser(PrimitiveParser):
 
 		return res
 
-class MarkantParser(Parser, CompositeParser):
-	"""Parser for Obi documents."""
+class RegistryParser(Parser, CompositeParser):
+	"""
+	Base class for parsers of composite data where
+	the parsing method is looked up by template ID.
+	"""
+
+	__slots__ = ("_template_id",)
+
+	_registry = {}
 
 	def __init__(self, template_id: str) -> None:
-		"""Constructor for class: `ObiParser`."""
+		"""Constructor for class: `RegistryParser`."""
 
-		self._dispatcher = {
-			"141001DE002": self._parse_bgl_debit,
-			"141001DE003": self._parse_dp_debit,
-			"141001DE011": self._parse_debit,
-		}
+		func = self._registry.get(template_id)
 
-		if template_id not in self._dispatcher:
+		# the registry is shared by all the parsers, so the parsing
+		# method must also be checked to belong to the parser's class
+		if func is None or getattr(type(self), func.__name__, None) is not func:
 			raise NotImplementedError(
 				"No composite data parsing method implemented "
 				f"for template with ID: '{template_id}'!"
@@ -262,309 +611,167 @@ class MarkantParser(Parser, CompositeParser):
 
 		self._template_id = template_id
 
-	def parse_items(self, items: list, amount: float) -> list:
-		"""Parses document items."""
-		return self._dispatcher[self._template_id](items, amount)
+	@classmethod
+	def register(cls, *template_ids: str) -> Callable:
+		"""Registers a composite data parsing method for templates."""
 
-	def _parse_bgl_debit(self, items: list, amount: float) -> list:
-		"""Parses penalty type items."""
+		def decorator(func: Callable) -> Callable:
+			for template_id in template_ids:
+				cls._registry[template_id] = func
+			return func
 
-		doc_items_amount = 0
-		calc_items_amount = 0
-		result = []
+		return decorator
 
-		for item in items:
-
-			item = list(item)
+	def parse_items(self, items: list, amount: float) -> list:
+		"""Parses document items."""
+		return self._registry[self._template_id](self, items, amount)
 
-			if item[1] == "":
-				item[1] = "0,000"
+	def _log_sum_mismatch(self) -> None:
+		"""Logs that the sum of item amounts doesn't match the document total amount."""
 
-			if item[2] == "":
-				item[2] = "0,000"
+		g_log.error("Sum of item amounts not equal to the document total amount!")
+		d_log.error("Sum of item amounts not equal to the document total amount!")
+		g_log.warning("Field 'items' will be removed from extracted data.")
 
-			if item[3] == "":
-				item[3] = "0,0000"
+class MarkantParser(RegistryParser):
+	"""Parser for Obi documents."""
 
-			if item[4] == "":
-				item[4] = "0,0000"
+	__slots__ = ()
 
-			doc_diff = self.parse_number(item[0], coerce = "float")
-			pcs_ordered = self.parse_number(item[1], coerce = "int")
-			pcs_delivered = self.parse_number(item[2], coerce = "int")
-			price_ordered = self.parse_number(item[3], coerce = "float")
-			price_delivered = self.parse_number(item[4], coerce = "float")
+	def _parse_diff_items(self, items: list, amount: float) -> list:
+		"""Parses items listing price and quantity differences."""
 
-			result.append([doc_diff, pcs_ordered, pcs_delivered, price_ordered, price_delivered])
+		cols = list(zip(*items)) or [()] * 5
+		parsed = np.empty(len(cols[0]), dtype = _MARKANT_ITEM)
 
-			if pcs_ordered == 0 and pcs_delivered == 0 and price_delivered == 0 and price_ordered == 0:
-				calc_diff = doc_diff
-			elif pcs_ordered == 0 and pcs_delivered == 0:
-				calc_diff = price_delivered - price_ordered
-			elif price_delivered == 0 and price_ordered == 0:
-				calc_diff = doc_diff
-			elif pcs_ordered == pcs_delivered:
-				calc_diff = (price_delivered - price_ordered) * pcs_ordered
-			elif price_delivered == price_ordered:
-				calc_diff = (pcs_ordered - pcs_delivered) * price_ordered
-			else:
-				calc_diff = (pcs_ordered - pcs_delivered) * (price_delivered - price_ordered)
+		# missing quantities and prices are treated as zeros
+		parsed["doc_diff"] = self.parse_numbers(cols[0], coerce = "float")
+		parsed["pcs_ordered"] = self.parse_numbers(["0,000" if val == "" else val for val in cols[1]], coerce = "int")
+		parsed["pcs_delivered"] = self.parse_numbers(["0,000" if val == "" else val for val in cols[2]], coerce = "int")
+		parsed["price_ordered"] = self.parse_numbers(["0,0000" if val == "" else val for val in cols[3]], coerce = "float")
+		parsed["price_delivered"] = self.parse_numbers(["0,0000" if val == "" else val for val in cols[4]], coerce = "float")
 
-			calc_diff = abs(round(calc_diff, 2))
+		calc_diffs = _markant_diffs(parsed)
+		result = [list(item) for item in parsed.tolist()]
 
-			calc_items_amount += calc_diff
-			doc_items_amount += doc_diff
+		# rounding is done by Python since the rounding
+		# in nopython mode differs for halfway values
+		doc_items_amount = round(math.fsum(parsed["doc_diff"].tolist()), 2)
+		calc_items_amount = round(math.fsum(abs(round(diff, 2)) for diff in calc_diffs.tolist()), 2)
 
-		doc_items_amount = round(doc_items_amount, 2)
-		calc_items_amount = round(calc_items_amount, 2)
-
-		if doc_items_amount + calc_items_amount != amount * 2:
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
+		# the amounts are compared in cents to avoid exact comparison of floats
+		if round(doc_items_amount * 100) + round(calc_items_amount * 100) != round(amount * 200):
+			self._log_sum_mismatch()
 			return None
 
 		return result
 
-	def _parse_dp_debit(self, items: list, amount: float) -> list:
+	@RegistryParser.register("141001DE002")
+	def _parse_bgl_debit(self, items: list, amount: float) -> list:
 		"""Parses penalty type items."""
+		return self._parse_diff_items(items, amount)
 
-		doc_items_amount = 0
-		calc_items_amount = 0
-		result = []
-
-		for item in items:
-
-			item = list(item)
-
-			if item[1] == "":
-				item[1] = "0,000"
-
-			if item[2] == "":
-				item[2] = "0,000"
-
-			if item[3] == "":
-				item[3] = "0,0000"
-
-			if item[4] == "":
-				item[4] = "0,0000"
-
-			doc_diff = self.parse_number(item[0], coerce = "float")
-			pcs_ordered = self.parse_number(item[1], coerce = "int")
-			pcs_delivered = self.parse_number(item[2], coerce = "int")
-			price_ordered = self.parse_number(item[3], coerce = "float")
-			price_delivered = self.parse_number(item[4], coerce = "float")
-
-			result.append([doc_diff, pcs_ordered, pcs_delivered, price_ordered, price_delivered])
-
-			if pcs_ordered == 0 and pcs_delivered == 0 and price_delivered == 0 and price_ordered == 0:
-				calc_diff = doc_diff
-			elif pcs_ordered == 0 and pcs_delivered == 0:
-				calc_diff = price_delivered - price_ordered
-			elif price_delivered == 0 and price_ordered == 0:
-				calc_diff = doc_diff
-			elif pcs_ordered == pcs_delivered:
-				calc_diff = (price_delivered - price_ordered) * pcs_ordered
-			elif price_delivered == price_ordered:
-				calc_diff = (pcs_ordered - pcs_delivered) * price_ordered
-			else:
-				calc_diff = (pcs_ordered - pcs_delivered) * (price_delivered - price_ordered)
-
-			calc_diff = abs(round(calc_diff, 2))
-
-			calc_items_amount += calc_diff
-			doc_items_amount += doc_diff
-
-		doc_items_amount = round(doc_items_amount, 2)
-		calc_items_amount = round(calc_items_amount, 2)
-
-		if doc_items_amount + calc_items_amount != amount * 2:
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
-			return None
-
-		return result
+	@RegistryParser.register("141001DE003")
+	def _parse_dp_debit(self, items: list, amount: float) -> list:
+		"""Parses penalty type items."""
+		return self._parse_diff_items(items, amount)
 
+	@RegistryParser.register("141001DE011")
 	def _parse_debit(self, items: list, amount: float) -> list:
 		"""Parses penalty type items."""
+		return self._parse_diff_items(items, amount)
 
-		doc_items_amount = 0
-		calc_items_amount = 0
-		result = []
-
-		for item in items:
-
-			item = list(item)
-
-			if item[1] == "":
-				item[1] = "0,000"
-
-			if item[2] == "":
-				item[2] = "0,000"
-
-			if item[3] == "":
-				item[3] = "0,0000"
-
-			if item[4] == "":
-				item[4] = "0,0000"
-
-			doc_diff = self.parse_number(item[0], coerce = "float")
-			pcs_ordered = self.parse_number(item[1], coerce = "int")
-			pcs_delivered = self.parse_number(item[2], coerce = "int")
-			price_ordered = self.parse_number(item[3], coerce = "float")
-			price_delivered = self.parse_number(item[4], coerce = "float")
-
-			result.append([doc_diff, pcs_ordered, pcs_delivered, price_ordered, price_delivered])
-
-			if pcs_ordered == 0 and pcs_delivered == 0 and price_delivered == 0 and price_ordered == 0:
-				calc_diff = doc_diff
-			elif pcs_ordered == 0 and pcs_delivered == 0:
-				calc_diff = price_delivered - price_ordered
-			elif price_delivered == 0 and price_ordered == 0:
-				calc_diff = doc_diff
-			elif pcs_ordered == pcs_delivered:
-				calc_diff = (price_delivered - price_ordered) * pcs_ordered
-			elif price_delivered == price_ordered:
-				calc_diff = (pcs_ordered - pcs_delivered) * price_ordered
-			else:
-				calc_diff = (pcs_ordered - pcs_delivered) * (price_delivered - price_ordered)
-
-			calc_diff = abs(round(calc_diff, 2))
-
-			calc_items_amount += calc_diff
-			doc_items_amount += doc_diff
-
-		doc_items_amount = round(doc_items_amount, 2)
-		calc_items_amount = round(calc_items_amount, 2)
+class ObiParser(RegistryParser):
+	"""Parser for Obi documents."""
 
-		if doc_items_amount + calc_items_amount != amount * 2:
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
-			return None
+	__slots__ = ()
 
-		return result
+	def _parse_columns(self, items: list, classify: Callable) -> list:
+		"""
+		Parses document items column by column. The `classify` function
+		returns the coercion used to parse a value or `None` if the value
+		is to be kept as it is.
+		"""
 
-class ObiParser(Parser, CompositeParser):
-	"""Parser for Obi documents."""
+		parsed_cols = []
+		parse_number = self.parse_number
 
-	def __init__(self, template_id: str) -> None:
-		"""Constructor for class: `ObiParser`."""
+		# the column layout is fixed, so columns with values of a single
+		# number shape are parsed at once and the rest value by value
+		for col in zip(*items):
 
-		self._dispatcher = {
-			"161001DE005": self._parse_delivery,
-			"161001DE001": self._parse_penalty,
-			"161072AT005": self._parse_penalty,
-			"161001DE007": self._parse_return,
-		}
+			num_types = [classify(val) for val in col]
 
-		if template_id not in self._dispatcher:
-			raise NotImplementedError(
-				"No composite data parsing method implemented "
-				f"for template with ID: '{template_id}'!"
-			)
+			if num_types[0] is not None and num_types.count(num_types[0]) == len(num_types):
+				parsed_cols.append(self.parse_numbers(col, coerce = num_types[0]))
+				continue
 
-		self._template_id = template_id
+			parsed_cols.append([
+				val if num_type is None else parse_number(val, coerce = num_type)
+				for val, num_type in zip(col, num_types)
+			])
 
-	def parse_items(self, items: list, amount: float) -> list:
-		"""Parses document items."""
-		return self._dispatcher[self._template_id](items, amount)
+		return [list(row) for row in zip(*parsed_cols)]
 
+	@RegistryParser.register("161001DE005")
 	def _parse_delivery(self, items: list, amount: float) -> list:
 		"""Parses delivery type items."""
 
-		result = []
-		items_amount = 0
-
-		for item in items:
-
-			parsed_item = []
-
-			for val in item:
-
-				if re.fullmatch(r"\d+,\d{3}", val):
-					parsed_val = self.parse_number(val, coerce = "int")
-				elif re.match(r"\d+,\d{4}", val):
-					parsed_val = self.parse_number(val, coerce = "float")
-				elif re.match(r"\d+,\d{2}", val):
-					parsed_val = self.parse_number(val, coerce = "float")
-				else:
-					parsed_val = val
-
-				parsed_item.append(parsed_val)
-
-			result.append(parsed_item)
-			diff = parsed_item[5] - parsed_item[2]
-			items_amount += diff
+		result = self._parse_columns(items, _classify_number)
+		items_amount = math.fsum(item[5] - item[2] for item in result)
 
 		# validate parsed data
 		if round(items_amount, 2) != amount:
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
+			self._log_sum_mismatch()
 			return None
 
 		return result
 
+	@RegistryParser.register("161001DE007")
 	def _parse_return(self, items: list, amount: float) -> list:
 		"""Parses delivery type items."""
 
-		result = []
-		items_amount = 0
-
-		for item in items:
-
-			parsed_item = []
+		# missing discounts (Rabatt) are treated as zeros
+		items = [["0,00" if val == "" else val for val in item] for item in items]
+		result = self._parse_columns(items, _classify_return_value)
 
-			for val in item:
-
-				if val == "":  # Rabatt
-					parsed_val = 0.0
-				elif val.isnumeric(): # LAR
-					parsed_val = self.parse_number(val, coerce = "int")
-				elif re.fullmatch(r"\d+,\d{3}", val): # Menge
-					parsed_val = self.parse_number(val, coerce = "int")
-				elif re.match(r"\d+,\d{4}", val): # EK-Preis
-					parsed_val = self.parse_number(val, coerce = "float")
-				elif re.match(r"\d+,\d{2}", val): # PosWert
-					parsed_val = self.parse_number(val, coerce = "float")
-				else:
-					parsed_val = val
-
-				parsed_item.append(parsed_val)
-
-			result.append(parsed_item)
-			items_amount += parsed_item[-1]
+		items_amount = math.fsum(item[-1] for item in result)
 
 		# validate parsed data
 		if round(items_amount, 2) != amount:
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
+			self._log_sum_mismatch()
 			return None
 
 		return result
 
+	@RegistryParser.register("161001DE001", "161072AT005")
 	def _parse_penalty(self, items: list, amount: float) -> list:
 		"""Parses penalty type items."""
 
-		items_amount = 0
+		items_amount_c = 0
 		err_tax_rate =  False
 		result = []
 
+		# bound once as the methods are called for each item
+		parse_number = self.parse_number
+		append_item = result.append
+
 		for item in items:
 
-			partial_penalty = self.parse_number(item[0])
-			po_number = self.parse_number(item[1], coerce = "int")
-			item_amount = self.parse_number(item[2])
+			partial_penalty = parse_number(item[0])
+			po_number = parse_number(item[1], coerce = "int")
+			item_amount = parse_number(item[2])
 			parsed = [partial_penalty, po_number, item_amount]
-			result.append(parsed)
+			append_item(parsed)
 
-			calc_rate = int(partial_penalty / item_amount * 100)
+			partial_penalty_c = int(round(partial_penalty * 100))
+			item_amount_c = int(round(item_amount * 100))
+
+			# items with zero amount have no valid tax rate
+			calc_rate = (partial_penalty_c * 100) // item_amount_c if item_amount_c else -1
 
 			if calc_rate in (2, 25):
-				items_amount += partial_penalty
+				items_amount_c += partial_penalty_c
 				continue
 
 			# possible reason: incorrect data extraction or mistake made by the customer
@@ -577,49 +784,32 @@ class ObiParser(Parser, CompositeParser):
 		if err_tax_rate:
 			return None
 
-		if round(items_amount, 2) != amount:
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
+		# the amounts are compared in cents to avoid exact comparison of floats
+		if items_amount_c != round(amount * 100):
+			self._log_sum_mismatch()
 			return None
 
 		return result
 
-class RollerParser(Parser, CompositeParser):
+class RollerParser(RegistryParser):
 	"""Parser for Roller documents."""
 
-	def __init__(self, template_id: str) -> None:
-		"""Constructor for class: `RollerParser`."""
-
-		self._dispatcher = {
-			"171001DE001": self._parse_return,
-		}
-
-		if template_id not in self._dispatcher:
-			raise NotImplementedError(
-				"No composite data parsing method implemented "
-				f"for template with ID: '{template_id}'!"
-			)
-
-		self._template_id = template_id
-
-	def parse_items(self, items: list, amount: float) -> list:
-		"""Parses document items."""
-		return self._dispatcher[self._template_id](items, amount)
+	__slots__ = ()
 
+	@RegistryParser.register("171001DE001")
 	def _parse_return(self, items: list, amount: float) -> list:
 		"""Parses deli  very type items."""
 
 		result = []
 		items_amount = 0
+		cols = list(zip(*items)) or [()] * 5
 
-		for item in items:
-
-			n_pieces = self.parse_number(item[0], coerce = "int")
-			amount_net = self.parse_number(item[1], coerce = "float")
-			tax_rate = self.parse_number(item[2], coerce = "float")
-			amount_tax = self.parse_number(item[3], coerce = "float")
-			amount_gross = self.parse_number(item[4], coerce = "float")
+		for n_pieces, amount_net, tax_rate, amount_tax, amount_gross in zip(
+				self.parse_numbers(cols[0], coerce = "int"),
+				self.parse_numbers(cols[1], coerce = "float"),
+				self.parse_numbers(cols[2], coerce = "float"),
+				self.parse_numbers(cols[3], coerce = "float"),
+				self.parse_numbers(cols[4], coerce = "float")):
 
 			if n_pieces <= 0:
 				raise ValueError("Number of pieces must be a positive integer!")
@@ -636,113 +826,91 @@ class RollerParser(Parser, CompositeParser):
 
 		# validate parsed data
 		if round(items_amount, 2) != amount:
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
+			self._log_sum_mismatch()
 			return None
 
 		return result
 
-class ToomParser(Parser, CompositeParser):
+class ToomParser(RegistryParser):
 	"""Parser for Toom documents."""
 
-	def __init__(self, template_id: str) -> None:
-		"""Constructor for class: `RollerParser`."""
-
-		self._dispatcher = {
-			"181001DE001": self._parse_return,
-		}
-
-		if template_id not in self._dispatcher:
-			raise NotImplementedError(
-				"No composite data parsing method implemented "
-				f"for template with ID: '{template_id}'!"
-			)
-
-		self._template_id = template_id
-
-	def parse_items(self, items: list, amount: float) -> list:
-		"""Parses document items."""
-
-		return self._dispatcher[self._template_id](items, amount)
+	__slots__ = ()
 
+	@RegistryParser.register("181001DE001")
 	def _parse_return(self, items: list, amount: float) -> list:
 		"""Parses return type items."""
 
-		result = []
-		items_gross_amount = 0
+		cols = list(zip(*items)) or [()] * 3
 
-		for item in items:
-			tax_rate = self.parse_number(item[0], coerce = "float")
-			n_pieces = self.parse_number(item[1], coerce = "int")
-			amount_net = self.parse_number(item[2], coerce = "float")
-			result.append([tax_rate, n_pieces, amount_net])
-			items_gross_amount += amount_net * n_pieces * (1 + tax_rate / 100)
+		result = [list(row) for row in zip(
+			self.parse_numbers(cols[0], coerce = "float"),
+			self.parse_numbers(cols[1], coerce = "int"),
+			self.parse_numbers(cols[2], coerce = "float"))]
+
+		items_gross_amount = math.fsum(
+			amount_net * n_pieces * (1 + tax_rate / 100)
+			for tax_rate, n_pieces, amount_net in result)
 
 		# validate parsed data
 		if not math.isclose(items_gross_amount, amount, rel_tol = 0.01):
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
+			self._log_sum_mismatch()
 			return None
 
 		return result
 
-class HornbachParser(Parser, CompositeParser):
+class HornbachParser(RegistryParser):
 	"""Parser for Toom documents."""
 
-	def __init__(self, template_id: str) -> None:
-		"""Constructor for class: `HornbachParser`."""
+	__slots__ = ()
 
-		self._dispatcher = {
-			"211072AT001": self._parse_delivery_price,
-			"211001DE001": self._parse_delivery_price,
-		}
+	def _extract_cols(self, items: list) -> tuple:
+		"""Parses the item columns into arrays of numbers."""
 
-		if template_id not in self._dispatcher:
-			raise NotImplementedError(
-				"No composite data parsing method implemented "
-				f"for template with ID: '{template_id}'!"
-			)
+		cols = list(zip(*items)) or [()] * 8
 
-		self._template_id = template_id
+		return (
+			np.array(self.parse_numbers(cols[0], coerce = "int", errors = "devaluate"), dtype = object),
+			np.array(self.parse_numbers(cols[1], coerce = "int"), dtype = np.int64),
+			np.array(self.parse_numbers(cols[2], coerce = "int"), dtype = np.int64),
+			np.array(self.parse_numbers(cols[3], coerce = "int"), dtype = np.int64),
+			np.array(self.parse_numbers(cols[4], coerce = "float"), dtype = np.float64),
+			np.array(self.parse_numbers(cols[5], coerce = "float"), dtype = np.float64),
+			np.array(self.parse_numbers(cols[6], coerce = "float"), dtype = np.float64),
+			np.array(self.parse_numbers(cols[7], coerce = "float"), dtype = np.float64),
+		)
 
+	@RegistryParser.register("211072AT001", "211001DE001")
 	def _parse_delivery_price(self, items: list, amount: float) -> list:
 		"""Parses return type items."""
 
-		result = []
-		items_gross_amount = 0
+		cols = self._extract_cols(items)
+		_, _, n_delivered, n_invoiced, amount_ordered, amount_invoiced, _, tax_rate = cols
+		result = [list(row) for row in zip(*(col.tolist() for col in cols))]
 
-		for item in items:
-			article_num = self.parse_number(item[0], coerce = "int", errors = "devaluate")
-			deliv_num = self.parse_number(item[1], coerce = "int")
-			n_invoiced = self.parse_number(item[3], coerce = "int")
-			n_delivered = self.parse_number(item[2], coerce = "int")
-			amount_ordered = self.parse_number(item[4], coerce = "float")
-			amount_invoiced = self.parse_number(item[5], coerce = "float")
-			item_net_amount = self.parse_number(item[6], coerce = "float")
-			tax_rate = self.parse_number(item[7], coerce = "float")
-			result.append([article_num, deliv_num, n_delivered, n_invoiced, amount_ordered, amount_invoiced, item_net_amount, tax_rate])
-			amount_invoiced = 0 if amount_invoiced == amount_ordered else amount_invoiced
-			gross_amount = (n_invoiced - n_delivered) * (amount_invoiced + amount_ordered) * (1 + tax_rate / 100)
-			items_gross_amount += gross_amount
+		items_gross_amount = _hornbach_gross(
+			n_invoiced, n_delivered, amount_invoiced, amount_ordered, tax_rate)
 
 		# validate parsed data
 		if not math.isclose(items_gross_amount, amount, rel_tol = 0.01):
-			g_log.error("Sum of item amounts not equal to the document total amount!")
-			d_log.error("Sum of item amounts not equal to the document total amount!")
-			g_log.warning("Field 'items' will be removed from extracted data.")
+			self._log_sum_mismatch()
 			return None
 
 		return result
 
-	def parse_items(self, items: list, amount: float) -> list:
-		"""Parses document items."""
-
-		return self._dispatcher[self._template_id](items, amount)
+# issuer -> parser of composite document data; templates
+# of other issuers get parsers of primitive data only
+_PARSER_REGISTRY = {
+	"OBI_AT": ObiParser,
+	"OBI_DE": ObiParser,
+	"MARKANT_DE": MarkantParser,
+	"ROLLER_DE": RollerParser,
+	# "TOOM_DE": ToomParser, # item parsing left out so far
+	"HORNBACH_AT": HornbachParser,
+	"HORNBACH_DE": HornbachParser,
+}
 
 # data extraction class
-class Template(OrderedDict):
+class Template(dict):
 	"""
 	Represents a template that lives
 	as a single .yml file on the disk.
@@ -776,29 +944,98 @@ class Template(OrderedDict):
 		"return"
 	]
 
-	_parser = None
+	# fields that must have a value in the extracted data
+	_nonnull_fields = (
+		"issuer",
+		"name",
+		"kind",
+		"document_number",
+		"amount",
+		"template_id",
+	)
+
+	# fields whose parsing needs values of other fields
+	_field_dependencies = {
+		"items": ("amount",),
+	}
+
+	__slots__ = (
+		"_options", "_compiled", "_literal_hints", "_literal_prefixes",
+		"_handlers", "_required", "_required_ordered", "_optional_ordered", "_parser",
+		"_keyword_literals", "_keyword_patterns", "_replacements",
+	)
 
 	def __init__(self, *args, **kwargs):
 		"""
 		Constructor of class: `Template`.
 
-		See docuemntation for OrderedDict for a detailed
+		See docuemntation for dict for a detailed
 		description of `args` and `kwargs` arguments.
 		"""
 
-		super(Template, self).__init__(*args, **kwargs)
+		super().__init__(*args, **kwargs)
+
+		self._parser = None
 
 		# set default options
 		self._options = {
 			"remove_whitespace": False,
 			"lowercase": False,
 			"replace": [],
-			"date_formats": []
+			"date_formats": [],
+			"regex_engine": "re"
 		}
 
 		# Merge template-specific options with defaults
 		self._options.update(self.get("options", {}))
 
+		# compile the 'replace' option patterns and field patterns once
+		# so that they aren't looked up for each processed document
+		self._replacements = []
+
+		for repl in self._options["replace"]:
+			if len(repl) != 2:
+				raise ValueError("A replace should be a list of 2 items!")
+			self._replacements.append((re.compile(repl[0]), repl[1]))
+
+		self._compiled = {}
+		self._literal_hints = {}
+		self._literal_prefixes = {}
+		self._handlers = {}
+
+		for fld, spec in self.get("fields", {}).items():
+			self._compiled[fld] = self._compile_field(spec)
+			self._literal_hints[fld] = [_get_literal_hint(patt) for patt in self._compiled[fld]]
+			self._literal_prefixes[fld] = [_get_literal_prefix(patt) for patt in self._compiled[fld]]
+			self._handlers[fld] = self._field_handlers.get(fld, Template._parse_default)
+
+		# keywords that can be looked up by a `KeywordIndex` instead of searching the text
+		self._keyword_literals = {}
+		self._keyword_patterns = {}
+
+		for kwd in list(self.get("inclusive_keywords", [])) + list(self.get("exclusive_keywords", [])):
+			self._keyword_literals[kwd] = _get_literal_expansion(kwd)
+			self._keyword_patterns[kwd] = re.compile(kwd)
+
+		fields = list(self.get("fields", {}))
+
+		# names of template fields that must be matched in a document
+		self._required = frozenset(fields) - frozenset(self.get("optional_fields", []))
+
+		# order in which the fields are extracted: required fields (along with
+		# the fields they depend on) go first, so that a non-matching template
+		# gets rejected on the first required field that fails to match
+		field_order = self._sort_fields(
+			[fld for fld in fields if fld in self._required] +
+			[fld for fld in fields if fld not in self._required])
+
+		n_required = max(
+			(idx + 1 for idx, fld in enumerate(field_order) if fld in self._required),
+			default = 0)
+
+		self._required_ordered = field_order[:n_required]
+		self._optional_ordered = field_order[n_required:]
+
 		# check the integrity of header fields
 		for fld in ["issuer", "kind", "name", "template_id"]:
 			if fld not in self.keys() or self[fld] is None:
@@ -848,7 +1085,7 @@ class Template(OrderedDict):
 				raise TypeError(f"Unsupported data type for 'category' field: {type(self['category'])}!")
 
 		# ensure proper casing of header field values
-		self["issuer"] = self["issuer"].upper()
+		self["issuer"] = sys.intern(self["issuer"].upper())
 		self["kind"] = self["kind"].lower()
 		self["template_id"] = self["template_id"].upper()
 
@@ -860,6 +1097,81 @@ class Template(OrderedDict):
 			else:
 				raise TypeError(f"Unsupported type: '{type(self['category'])}' for 'category' field!")
 
+	def _compile_field(self, spec: Union[str,list,dict]) -> list:
+		"""
+		Compiles the regex pattern(s) of a template field.
+
+		A field is defined either by a pattern, a list of alternative patterns
+		or a mapping with the pattern(s) stored under the 'regex' key and an
+		optional 'anchor' key. If 'anchor' is set to 'line', then the patterns
+		are allowed to match only whole lines of the document text.
+
+		The patterns are compiled by the engine set in the 'regex_engine'
+		template option ('re' or 're2').
+		"""
+
+		engine = self._options["regex_engine"]
+
+		if engine == "re":
+			compile_patt = re.compile
+		elif engine == "re2":
+			compile_patt = _compile_re2
+		else:
+			raise ValueError(f"Unrecognized regex engine: '{engine}'!")
+
+		anchor = None
+
+		if isinstance(spec, dict):
+			anchor = spec.get("anchor")
+			spec = spec["regex"]
+
+		rx_patts = spec if isinstance(spec, list) else [spec]
+
+		if anchor is None:
+			return [compile_patt(patt) for patt in rx_patts]
+
+		if anchor != "line":
+			raise ValueError(f"Unrecognized field anchor: '{anchor}'!")
+
+		anchored = []
+
+		for patt in rx_patts:
+
+			# global flags must stay at the start of the wrapped pattern
+			flags = _RX_GLOBAL_FLAGS.match(patt).group(0)
+			body = patt[len(flags):]
+
+			# a comment in a verbose pattern would swallow the closing anchor
+			if "x" in flags:
+				body += "\n"
+
+			anchored.append(compile_patt(f"(?m){flags}^(?:{body})$"))
+
+		return anchored
+
+	def _sort_fields(self, fields: list) -> list:
+		"""
+		Orders template fields so that each field comes after the
+		fields it depends on. Otherwise, the template order is kept.
+		"""
+
+		ordered = []
+
+		def visit(fld: str) -> None:
+			if fld in ordered:
+				return
+
+			for dep in self._field_dependencies.get(fld, ()):
+				if dep in fields:
+					visit(dep)
+
+			ordered.append(fld)
+
+		for fld in fields:
+			visit(fld)
+
+		return ordered
+
 	def _validate_numbering(self, val: Union[str,list], field: str = None) -> None:
 		"""Validates the correctness of delivery note number(s)."""
 
@@ -893,17 +1205,34 @@ class Template(OrderedDict):
 				raise ValueError(f"Unrecognized numbering type: '{field}'!")
 
 	def _match_patterns(
-			self, text: str, regex: Union[str,list],
-			duplicates: bool = False) -> list:
-		"""Performs matching of multiple regex patters on a text."""
+			self, text: str, rx_patts: list, hints: list, prefixes: list,
+			duplicates: bool = False, unique: bool = False) -> list:
+		"""Performs matching of multiple compiled regex patters on a text."""
 
-		# ensure patts are placed in a list container
-		rx_patts = regex if isinstance(regex, list) else [regex]
 		res_find = []
 
-		for patt in rx_patts:
+		for patt, hint, prefix in zip(rx_patts, hints, prefixes):
+
+			# a match of a pattern starting with a literal can't
+			# start before the first occurrence of the literal
+			start = text.find(prefix) if prefix else 0
 
-			matches = re.findall(patt, text)
+			# a pattern can't match if its literal part is missing
+			if start == -1 or (hint != prefix and hint not in text):
+				continue
+
+			if unique and not duplicates:
+				# two distinct values are enough to
+				# reject a field that must be unique
+				matches = []
+				for match in patt.finditer(text, start):
+					val = self._get_match_value(match)
+					if val not in matches:
+						matches.append(val)
+					if len(matches) > 1:
+						break
+			else:
+				matches = patt.findall(text, start)
 
 			if len(matches) == 0:
 				continue
@@ -917,6 +1246,110 @@ class Template(OrderedDict):
 
 		return res_find
 
+	def _get_match_value(self, match: re.Match) -> Union[str,tuple]:
+		"""Returns the value of a match in the same form as `re.findall()`."""
+
+		groups = match.groups(default = "")
+
+		if len(groups) == 0:
+			return match.group(0)
+
+		if len(groups) == 1:
+			return groups[0]
+
+		return groups
+
+	def _parse_amount(self, fld: str, result: list, output: dict) -> float: # pylint: disable = W0613
+		"""Parses the total document amount."""
+
+		parsed = self.parser.parse_number(result[0], coerce = "float")
+
+		if parsed <= 0.0:
+			raise ValueError("Extracted document amount must be a non-zero positive float!")
+
+		return parsed
+
+	def _parse_code(self, fld: str, result: list, output: dict) -> int: # pylint: disable = W0613
+		"""Parses a numeric code such as zip, branch or archive number."""
+		self._validate_numbering(result[0])
+		return self.parser.parse_number(result[0], coerce = "int")
+
+	def _parse_identifier(self, fld: str, result: list, output: dict) -> Union[int,str]: # pylint: disable = W0613
+		"""Parses an identifier that is kept as is if not numeric."""
+		return self.parser.parse_number(result[0], coerce = "int", errors = "ignore")
+
+	def _parse_tax(self, fld: str, result: list, output: dict) -> Union[float,list]: # pylint: disable = W0613
+		"""Parses tax amount(s)."""
+
+		if len(result) == 1:
+			return self.parser.parse_number(result[0], coerce = "float")
+
+		return self.parser.parse_numbers(result, coerce = "float")
+
+	def _parse_subtotals(self, fld: str, result: list, output: dict) -> list: # pylint: disable = W0613
+		"""Parses subtotal amounts."""
+		return self.parser.parse_numbers(result[0], coerce = "float")
+
+	def _parse_numbering(self, fld: str, result: list, output: dict) -> Union[int,list]: # pylint: disable = W0613
+		"""Parses document number(s) such as delivery or invoice numbers."""
+
+		self._validate_numbering(result, fld)
+
+		if len(result) == 1:
+			return self.parser.parse_number(result[0], coerce = "int")
+
+		return self.parser.parse_numbers(result, coerce = "int")
+
+	def _parse_items(self, fld: str, result: list, output: dict) -> Union[list,None]: # pylint: disable = W0613
+		"""Parses document items."""
+
+		# NOTE: items are always parsed after amount (see `_field_dependencies`)
+		if isinstance(self.parser, CompositeParser):
+			return self.parser.parse_items(result, output["amount"])
+
+		return result
+
+	def _parse_email(self, fld: str, result: list, output: dict) -> str: # pylint: disable = W0613
+		"""Parses an email address."""
+		return result[0].replace(" ", "")
+
+	def _parse_reason(self, fld: str, result: list, output: dict) -> Union[str,list]: # pylint: disable = W0613
+		"""Parses the reason(s) stated in the document."""
+
+		# patterns with a single group match strings,
+		# patterns with multiple groups match tuples
+		if isinstance(result[0], str):
+			return result[0].strip()
+
+		return [val.strip() for val in result[0]]
+
+	def _parse_default(self, fld: str, result: list, output: dict) -> str: # pylint: disable = W0613
+		"""Returns the first matched value."""
+		return result[0]
+
+	# field name -> value parsing method; fields
+	# not listed here are parsed by `_parse_default()`
+	_field_handlers = {
+		"amount": _parse_amount,
+		"zip": _parse_code,
+		"archive_number": _parse_code,
+		"branch": _parse_code,
+		"supplier": _parse_identifier,
+		"document_number": _parse_identifier,
+		"identifier": _parse_identifier,
+		"backreference_number": _parse_identifier,
+		"tax": _parse_tax,
+		"subtotals": _parse_subtotals,
+		"delivery_number": _parse_numbering,
+		"invoice_number": _parse_numbering,
+		"purchase_order_number": _parse_numbering,
+		"return_number": _parse_numbering,
+		"agreement_number": _parse_numbering,
+		"items": _parse_items,
+		"email": _parse_email,
+		"reason": _parse_reason,
+	}
+
 	def prepare_input(self, raw_str: str) -> str:
 		"""
 		Transform raw string using settings
@@ -933,7 +1366,7 @@ class Template(OrderedDict):
 
 		# Remove excessive withspace
 		if self._options["remove_whitespace"]:
-			optimized_str = re.sub(r"\s{2,}", "", raw_str)
+			optimized_str = _RX_WHITESPACE_RUN.sub("", raw_str)
 		else:
 			optimized_str = raw_str
 
@@ -942,33 +1375,66 @@ class Template(OrderedDict):
 			optimized_str = optimized_str.lower()
 
 		# specific replace
-		for repl in self._options["replace"]:
-			if len(repl) != 2:
-				raise ValueError("A replace should be a list of 2 items!")
-			optimized_str = re.sub(repl[0], repl[1], optimized_str)
+		for patt, repl in self._replacements:
+			optimized_str = patt.sub(repl, optimized_str)
 
 		return optimized_str
 
-	def matches_keywords(self, text: str) -> bool:
+	@property
+	def keyword_literals(self) -> set:
+		"""plain strings to which the template keywords expand"""
+		return {
+			literal for literals in self._keyword_literals.values()
+			if literals is not None for literal in literals
+		}
+
+	def _find_keyword(
+			self, kwd: str, text: str, hits: frozenset = None,
+			cache: dict = None) -> bool:
+		"""
+		Checks if a keyword is found in a text. Keywords expanding to plain
+		strings are looked up in the keyword index hits, if these are passed.
+		Results of other keywords are stored in the cache, if one is passed.
+		"""
+
+		literals = None if hits is None else self._keyword_literals.get(kwd)
+
+		if literals is not None:
+			return not hits.isdisjoint(literals)
+
+		if cache is None:
+			return self._keyword_patterns[kwd].search(text) is not None
+
+		if kwd not in cache:
+			cache[kwd] = self._keyword_patterns[kwd].search(text) is not None
+
+		return cache[kwd]
+
+	def matches_keywords(
+			self, text: str, hits: frozenset = None,
+			cache: dict = None) -> bool:
 		"""
 		Check if document text matches all
 		keywords stated in the template file.
+
+		If `hits` returned by `KeywordIndex.scan()` for the text are passed,
+		then plain string keywords aren't searched for in the text again.
+		A `cache` dict shared by the templates matched against the same text
+		ensures that a keyword pattern is searched for in the text only once.
 		"""
 
-		inclusive = [bool(re.findall(kwd, text)) for kwd in self["inclusive_keywords"]]
+		# the first missing inclusive keyword decides the result
+		if not all(self._find_keyword(kwd, text, hits, cache) for kwd in self["inclusive_keywords"]):
+			return False
 
 		# these types ow keywords are optional when excluding certain
 		# substrings is needed to filter on document types
-		if "exclusive_keywords" in self:
-			exclusive = [bool(re.findall(kwd, text)) for kwd in self["exclusive_keywords"]]
-		else:
-			exclusive = []
+		if any(self._find_keyword(kwd, text, hits, cache) for kwd in self.get("exclusive_keywords", [])):
+			return False
 
-		if all(inclusive) and not any(exclusive):
-			d_log.info("Matched template: '%s'", self["name"])
-			return True
+		d_log.info("Matched template: '%s'", self["name"])
 
-		return False
+		return True
 
 	def extract(self, text: str) -> dict:
 		"""Given a template file and a string,
@@ -980,28 +1446,32 @@ class Template(OrderedDict):
 		d_log.info("Exclusive keywords = %s", self.get("exclusive_keywords", []))
 		d_log.info("Options = %s", self._options)
 
-		output = OrderedDict()
+		output = {}
 		output["issuer"] = self["issuer"]
 		output["name"] = self["name"]
 		output["kind"] = self["kind"]
 		output["template_id"] = self["template_id"]
 		output["category"] = self["category"]
 
-		optional_fields = self.get("optional_fields", [])
-
 		# Try to find data for each field.
-		for fld, regex in self["fields"].items():
+		for fld in self._required_ordered + self._optional_ordered:
+
+			regex = self["fields"][fld]
 
 			allow_duplicates = fld == "items"
-			result = self._match_patterns(text, regex, allow_duplicates)
+			unique = fld in self._unique_value_fields
+			result = self._match_patterns(
+				text, self._compiled[fld], self._literal_hints[fld], self._literal_prefixes[fld],
+				allow_duplicates, unique)
 
 			if len(result) == 0:
-				# do not raise exception even if no value was found,
-				# but keep matching to get as much data as possible
-				if fld in optional_fields:
-					d_log.warning(f"regexp '{regex}' for optional field '{fld}' didn't match!")
-				else:
+				# a missing required field disqualifies the template,
+				# so there's no point in matching the remaining fields
+				if fld in self._required:
 					d_log.error(f"regexp '{regex}' for field '{fld}' didn't match!")
+					raise PatternMatchError(f"Required fields unmatched: ['{fld}']")
+
+				d_log.warning(f"regexp '{regex}' for optional field '{fld}' didn't match!")
 			elif len(result) > 1 and fld in self._unique_value_fields:
 				d_log.error(
 					f"Field '{fld}': regex pattern '{regex}' should "
@@ -1009,69 +1479,21 @@ class Template(OrderedDict):
 				raise PatternMatchError(
 					f"Field '{fld}': regex pattern '{regex}' matched "
 					"multiple values while only one is expected!")
-			elif fld == "amount":
-				output[fld] = self.parser.parse_number(result[0], coerce = "float")
-				if output[fld] <= 0.0:
-					raise ValueError("Extracted document amount must be a non-zero positive float!")
-			elif fld in ("zip", "archive_number", "branch"):
-				self._validate_numbering(result[0])
-				output[fld] = self.parser.parse_number(result[0], coerce = "int")
-			elif fld in ("supplier", "document_number", "identifier", "backreference_number"):
-				output[fld] = self.parser.parse_number(result[0], coerce = "int", errors = "ignore")
-			elif fld == "tax":
-				if len(result) == 1:
-					output[fld] = self.parser.parse_number(result[0], coerce = "float")
-				else:
-					output[fld] = self.parser.parse_numbers(result, coerce = "float")
-			elif fld == "subtotals":
-				output[fld] = self.parser.parse_numbers(result[0], coerce = "float")
-			elif fld in ("delivery_number", "invoice_number", "purchase_order_number", "return_number", "agreement_number"):
-				self._validate_numbering(result, fld)
-				if len(result) == 1:
-					output[fld] = self.parser.parse_number(result[0], coerce = "int")
-				else:
-					output[fld] = self.parser.parse_numbers(result, coerce = "int")
-			elif fld == "items":
-				# NOTE: in yaml templates, items must always come after amount,
-				# otherwise item parsing won't be possibe - consider refactoring
-				if isinstance(self.parser, CompositeParser):
-					output[fld] = self.parser.parse_items(result, output["amount"])
-				else:
-					output[fld] = result
-			elif fld == "email":
-				output[fld] = result[0].replace(" ", "")
-			elif fld == "reason":
-				if isinstance(result[0], (tuple, list)):
-					output[fld] = [val.strip() for val in result[0]]
-				elif isinstance(result[0], str):
-					output[fld] = result[0].strip()
-				else:
-					raise TypeError("Unexpected type of the 'reason' field!")
 			else:
-				output[fld] = result[0]
-
-			d_log.info(f"field: '{fld}' | result: {result} | regexp: '{regex}'")
+				output[fld] = self._handlers[fld](self, fld, result, output)
 
-		# If required fields were found, return output, else log error.
-		templ_fields = set(self["fields"]) # list of all field names in a tempate
-		req_fields = templ_fields.difference(optional_fields)
-		req_unmatched = set(req_fields).difference(output.keys())
-		req_unmatched = list(req_unmatched)
-
-		if len(req_unmatched) != 0:
-			d_log.error(f"Required fields unmatched: {req_unmatched}")
-			raise PatternMatchError(f"Required fields unmatched: {req_unmatched}")
+			if d_log.isEnabledFor(logging.DEBUG):
+				d_log.debug("field: '%s' | result: %s | regexp: '%s'", fld, result, regex)
 
 		# each data dict must contain at least
 		# these filelds once parsing is done
-		assert output["issuer"] is not None
-		assert output["name"] is not None
-		assert output["kind"] is not None
-		assert output["document_number"] is not None
-		assert output["amount"] is not None
-		assert output["template_id"] is not None
+		missing_nonnull = [fld for fld in self._nonnull_fields if output.get(fld) is None]
+
+		if missing_nonnull:
+			d_log.error(f"Required fields without value: {missing_nonnull}")
+			raise PatternMatchError(f"Required fields without value: {missing_nonnull}")
 
-		return dict(output)
+		return output
 
 	def accept_parser(self, psr: Parser) -> None:
 		"""Sets data parser."""
@@ -1086,6 +1508,9 @@ def create_template(tpl_path: str) -> Template:
 	"""
 	Creates document data parser.
 
+	Templates are cached, so a template file is loaded
+	again only if it was modified since the last load.
+
 	Params:
 	-------
 	tpl_path: Path to the yaml file with parsing rules.
@@ -1095,11 +1520,29 @@ def create_template(tpl_path: str) -> Template:
 	Document data parser.
 	"""
 
+	abs_path = abspath(tpl_path)
+
+	return _create_template(abs_path, getmtime(abs_path))
+
+def _read_template_file(tpl_path: str) -> dict:
+	"""Reads the content of a template file."""
+
 	with open(tpl_path, encoding = "utf-8") as stream:
-		tpl = yaml.safe_load(stream)
+		return yaml.load(stream, Loader = CSafeLoader)
+
+@lru_cache(maxsize = None)
+def _create_template(tpl_path: str, mtime: float) -> Template: # pylint: disable = W0613
+	"""Creates document data parser for a template file with a given modification time."""
+
+	tpl = _read_template_file(tpl_path)
 
 	tpl["name"] = splitext(basename(tpl_path))[0]
-	template_id = tpl["template_id"]
+
+	# field names loaded from yaml aren't interned by the interpreter
+	tpl["fields"] = {sys.intern(fld): regex for fld, regex in tpl["fields"].items()}
+
+	if tpl.get("optional_fields"):
+		tpl["optional_fields"] = [sys.intern(fld) for fld in tpl["optional_fields"]]
 
 	if "optional_fields" in tpl["fields"].keys():
 		raise KeyError("Field 'optional_fields' misplaced!")
@@ -1115,19 +1558,10 @@ def create_template(tpl_path: str) -> Template:
 	issuer = tpl["issuer"]
 	template_id = tpl["template_id"]
 
+	parser_cls = _PARSER_REGISTRY.get(issuer)
+
 	try:
-		if issuer in ("OBI_AT", "OBI_DE"):
-			parser = ObiParser(template_id)
-		elif issuer == "MARKANT_DE":
-			parser = MarkantParser(template_id)
-		elif issuer == "ROLLER_DE":
-			parser = RollerParser(template_id)
-		# elif issuer == "TOOM DE": # item parsing left out so far
-		#     parser = ToomParser(template_id)
-		elif issuer in ("HORNBACH_AT", "HORNBACH_DE"):
-			parser = HornbachParser(template_id)
-		else:
-			parser = Parser()
+		parser = Parser() if parser_cls is None else parser_cls(template_id)
 	except NotImplementedError as exc:
 		g_log.warning(f"{str(exc)} Only parsing of primitive document data is possible.")
 		parser = Parser()
@@ -2,6 +2,7 @@
 
 """Base module for data parsers."""
 
+import copy
 import math
 import re
 import os
@@ -9,15 +10,30 @@ import sys
 from os.path import join
 from abc import abstractmethod
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime
-from os.path import basename, splitext
+from functools import lru_cache
+from logging import Logger
 from typing import Union
+import ahocorasick
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+try:
+    from re import _parser as sre_parse
+except ImportError: # python < 3.11
+    import sre_parse
+
 from . import logger
 
 g_log = logger.get_logger("global")
 
+TEMPLATES_ROOT = join(sys.path[0], "engine", "templates")
+
 class PatternMatchError(Exception):
     """Unmatched or mismatched regex pattern(s) for a mandatory field."""
 
@@ -194,6 +210,12 @@ class CompositeParser(PrimitiveParser):
 
         self._template_id = template_id
 
+    def _log_sum_mismatch(self) -> None:
+        """Logs that the sum of item amounts doesn't match the document total amount."""
+
+        g_log.error("Sum of item amounts not equal to the document total amount!")
+        g_log.warning("Field 'items' will be removed from extracted data.")
+
     @abstractmethod
     def parse_items(self, items: list, amount: float) -> Union[list,None]:
         """
@@ -269,9 +291,7 @@ class MarkantParser(CompositeParser):
         calc_items_amount = round(calc_items_amount, 2)
 
         if doc_items_amount + calc_items_amount != amount * 2:
-            raise RuntimeError("Sum of item amounts not equal to the document total amount!")
-            self.logger.error("Sum of item amounts not equal to the document total amount!")
-            g_log.warning("Field 'items' will be removed from extracted data.")
+            self._log_sum_mismatch()
             return None
 
         return result
@@ -305,9 +325,7 @@ class MarkantParser(CompositeParser):
         calc_items_amount = round(calc_items_amount, 2)
 
         if doc_items_amount + calc_items_amount != amount * 2:
-            g_log.error("Sum of item amounts not equal to the document total amount!")
-            self.logger.error("Sum of item amounts not equal to the document total amount!")
-            g_log.warning("Field 'items' will be removed from extracted data.")
+            self._log_sum_mismatch()
             return None
 
         return result
@@ -361,9 +379,7 @@ class ObiParser(CompositeParser):
 
         # validate parsed data
         if round(items_amount, 2) != amount:
-            g_log.error("Sum of item amounts not equal to the document total amount!")
-            self.logger.error("Sum of item amounts not equal to the document total amount!")
-            g_log.warning("Field 'items' will be removed from extracted data.")
+            self._log_sum_mismatch()
             return None
 
         return result
@@ -400,9 +416,7 @@ class ObiParser(CompositeParser):
 
         # validate parsed data
         if round(items_amount, 2) != amount:
-            g_log.error("Sum of item amounts not equal to the document total amount!")
-            self.logger.error("Sum of item amounts not equal to the document total amount!")
-            g_log.warning("Field 'items' will be removed from extracted data.")
+            self._log_sum_mismatch()
             return None
 
         return result
@@ -429,7 +443,6 @@ class ObiParser(CompositeParser):
                 continue
 
             # possible reason: incorrect data extraction or mistake made by the customer
-            self.logger.error("Invalid tax rate %.2f %% in document items!", calc_rate)
             g_log.error("Invalid tax rate %.2f %% in document items!", calc_rate)
             g_log.warning("Field 'items' will be removed from extracted data.")
             err_tax_rate = True
@@ -439,9 +452,7 @@ class ObiParser(CompositeParser):
             return None
 
         if round(items_amount, 2) != amount:
-            g_log.error("Sum of item amounts not equal to the document total amount!")
-            self.logger.error("Sum of item amounts not equal to the document total amount!")
-            g_log.warning("Field 'items' will be removed from extracted data.")
+            self._log_sum_mismatch()
             return None
 
         return result
@@ -492,9 +503,7 @@ class RollerParser(CompositeParser):
 
         # validate parsed data
         if round(items_amount, 2) != amount:
-            g_log.error("Sum of item amounts not equal to the document total amount!")
-            self.logger.error("Sum of item amounts not equal to the document total amount!")
-            g_log.warning("Field 'items' will be removed from extracted data.")
+            self._log_sum_mismatch()
             return None
 
         return result
@@ -531,14 +540,31 @@ class ToomParser(CompositeParser):
 
         # validate parsed data
         if not math.isclose(items_gross_amount, amount, rel_tol = 0.01):
-            g_log.error("Sum of item amounts not equal to the document total amount!")
-            self.logger.error("Sum of item amounts not equal to the document total amount!")
-            g_log.warning("Field 'items' will be removed from extracted data.")
+            self._log_sum_mismatch()
             return None
 
         return result
 
 # data extraction class
+def _get_keyword_literal(kwd: str) -> Union[str,None]:
+    """
+    Returns the plain string matched by a keyword pattern
+    that contains no regex constructs, otherwise `None`.
+    """
+
+    try:
+        parsed = sre_parse.parse(kwd)
+    except re.error:
+        return None
+
+    if parsed.state.flags & re.IGNORECASE or len(parsed) == 0:
+        return None
+
+    if not all(opcode is sre_parse.LITERAL for opcode, _ in parsed):
+        return None
+
+    return "".join(chr(char) for _, char in parsed)
+
 class Template(OrderedDict):
     """
     Represents a template that lives
@@ -558,6 +584,17 @@ class Template(OrderedDict):
         "zip",
     ]
 
+    # fields that each data dict must contain
+    # once the parsing of a document is done
+    _required_output_fields = frozenset([
+        "issuer",
+        "name",
+        "kind",
+        "document_number",
+        "amount",
+        "template_id",
+    ])
+
     _categs = [
         "bonus",
         "delivery",
@@ -595,6 +632,31 @@ class Template(OrderedDict):
         # Merge template-specific options with defaults
         self._options.update(self.get("options", {}))
 
+        keywords = []
+
+        for key in ("inclusive_keywords", "exclusive_keywords"):
+            kwds = self.get(key, [])
+            keywords.extend(kwds if isinstance(kwds, list) else [kwds])
+
+        # keyword patterns are compiled once per template, plain string
+        # keywords are looked up by the keyword automaton of the extractor
+        # or searched for as substrings of the text
+        self._keyword_patterns = {}
+        self._keyword_literals = {}
+
+        for kwd in keywords:
+            literal = _get_keyword_literal(kwd)
+            if literal is None:
+                self._keyword_patterns[kwd] = re.compile(kwd)
+            else:
+                self._keyword_literals[kwd] = literal
+
+        # field patterns are compiled once per template as well
+        self._field_patterns = {
+            fld: [re.compile(patt) for patt in (regex if isinstance(regex, list) else [regex])]
+            for fld, regex in self.get("fields", {}).items()
+        }
+
         # check the integrity of header fields
         for fld in ["issuer", "kind", "name", "template_id"]:
             if fld not in self.keys() or self[fld] is None:
@@ -647,6 +709,7 @@ class Template(OrderedDict):
         self["issuer"] = self["issuer"].upper()
         self["kind"] = self["kind"].lower()
         self["template_id"] = self["template_id"].upper()
+        self._customer = self["issuer"].partition("_")[0]
 
         if self["kind"] == "debit":
             if isinstance(self["category"], str):
@@ -689,17 +752,15 @@ class Template(OrderedDict):
                 raise ValueError(f"Unrecognized numbering type: '{field}'!")
 
     def _match_patterns(
-            self, text: str, regex: Union[str,list],
+            self, text: str, rx_patts: list,
             duplicates: bool = False) -> list:
-        """Performs matching of multiple regex patters on a text."""
+        """Performs matching of multiple compiled regex patters on a text."""
 
-        # ensure patts are placed in a list container
-        rx_patts = regex if isinstance(regex, list) else [regex]
         res_find = []
 
         for patt in rx_patts:
 
-            matches = re.findall(patt, text)
+            matches = patt.findall(text)
 
             if len(matches) == 0:
                 continue
@@ -745,23 +806,36 @@ class Template(OrderedDict):
 
         return optimized_str
 
-    def matches_keywords(self, text: str) -> bool:
+    def _find_keyword(self, kwd: str, text: str, found: set = None) -> bool:
+        """
+        Checks if a keyword occurs in a text. Plain string keywords are
+        looked up in `found`, the plain strings found by a keyword automaton.
+        """
+
+        if kwd in self._keyword_patterns:
+            return self._keyword_patterns[kwd].search(text) is not None
+
+        if found is not None:
+            return self._keyword_literals[kwd] in found
+
+        return self._keyword_literals[kwd] in text
+
+    def matches_keywords(self, text: str, found: set = None) -> bool:
         """Check if document text matches all keywords stated in the template file."""
 
-        inclusive = [bool(re.findall(kwd, text)) for kwd in self["inclusive_keywords"]]
+        # stop at the first missing inclusive keyword
+        if not all(self._find_keyword(kwd, text, found) for kwd in self["inclusive_keywords"]):
+            return False
 
         # these types ow keywords are optional when excluding
         # certain substrings is needed to filter on document types
-        if "exclusive_keywords" in self:
-            exclusive = [bool(re.findall(kwd, text)) for kwd in self["exclusive_keywords"]]
-        else:
-            exclusive = []
+        if any(self._find_keyword(kwd, text, found) for kwd in self.get("exclusive_keywords", [])):
+            return False
 
-        if all(inclusive) and not any(exclusive):
-            self.logger.info("Matched template: '%s'", self["name"])
-            return True
+        # the document logger is set only once the template is used for extraction
+        g_log.info("Matched template: '%s'", self["name"])
 
-        return False
+        return True
 
     def extract(self, text: str, psr: CompositeParser) -> dict:
         """Given a template file and a string, extract matching data fields."""
@@ -771,7 +845,7 @@ class Template(OrderedDict):
         self.logger.info("Exclusive keywords = %s", self.get("exclusive_keywords", []))
         self.logger.info("Options = %s", self._options)
 
-        output = OrderedDict()
+        output = {}
         output["issuer"] = self["issuer"]
         output["name"] = self["name"]
         output["kind"] = self["kind"]
@@ -784,7 +858,7 @@ class Template(OrderedDict):
         for fld, regex in self["fields"].items():
 
             allow_duplicates = fld == "items"
-            result = self._match_patterns(text, regex, allow_duplicates)
+            result = self._match_patterns(text, self._field_patterns[fld], allow_duplicates)
 
             if len(result) == 0:
                 # do not raise exception even if no value was found,
@@ -797,27 +871,27 @@ class Template(OrderedDict):
                 self.logger.error(f"Field '{fld}': regex pattern '{regex}' should match a unique value, but found: {result}!")
                 raise PatternMatchError(f"Field '{fld}': regex pattern '{regex}' matched multiple values while only one is expected!")
             elif fld == "amount":
-                output[fld] = self.parser.parse_number(result[0], coerce = "float")
+                output[fld] = psr.parse_number(result[0], coerce = "float")
                 if output[fld] <= 0.0:
                     raise ValueError("Extracted document amount must be a non-zero positive float!")
             elif fld in ("zip", "archive_number", "branch"):
                 self._validate_numbering(result[0])
-                output[fld] = self.parser.parse_number(result[0], coerce = "int")
+                output[fld] = psr.parse_number(result[0], coerce = "int")
             elif fld in ("supplier", "document_number", "identifier"):
-                output[fld] = self.parser.parse_number(result[0], coerce = "int", errors = "ignore")
+                output[fld] = psr.parse_number(result[0], coerce = "int", errors = "ignore")
             elif fld == "tax":
                 if len(result) == 1:
-                    output[fld] = self.parser.parse_number(result[0], coerce = "float", strip_vals = ["%"])
+                    output[fld] = psr.parse_number(result[0], coerce = "float", strip_vals = ["%"])
                 else:
-                    output[fld] = self.parser.parse_numbers(result, coerce = "float", strip_vals = ["%"])
+                    output[fld] = psr.parse_numbers(result, coerce = "float", strip_vals = ["%"])
             elif fld == "subtotals":
-                output[fld] = self.parser.parse_numbers(result[0], coerce = "float")
+                output[fld] = psr.parse_numbers(result[0], coerce = "float")
             elif fld in ("delivery_number", "invoice_number", "purchase_order_number", "return_number", "agreement_number"):
                 self._validate_numbering(result, fld)
                 if len(result) == 1:
-                    output[fld] = self.parser.parse_number(result[0], coerce = "int")
+                    output[fld] = psr.parse_number(result[0], coerce = "int")
                 else:
-                    output[fld] = self.parser.parse_numbers(result, coerce = "int")
+                    output[fld] = psr.parse_numbers(result, coerce = "int")
             elif fld == "items":
                 # NOTE: in yaml templates, items must always come after amount, otherwise item parsing won't be possibe - consider refactoring
                 output[fld] = psr.parse_items(result, output["amount"])
@@ -836,16 +910,22 @@ class Template(OrderedDict):
             self.logger.error(f"Required fields unmatched: {req_unmatched}")
             raise PatternMatchError(f"Required fields unmatched: {req_unmatched}")
 
-        # each data dict must contain at least
-        # these filelds once parsing is done
-        assert output["issuer"] is not None
-        assert output["name"] is not None
-        assert output["kind"] is not None
-        assert output["document_number"] is not None
-        assert output["amount"] is not None
-        assert output["template_id"] is not None
+        missing = [fld for fld in self._required_output_fields if output.get(fld) is None]
+
+        if len(missing) != 0:
+            raise ValueError(f"Missing required fields: {missing}")
+
+        return output
+
+    @property
+    def keyword_literals(self) -> dict:
+        """Plain strings of the template's plain string keywords, by keyword."""
+        return self._keyword_literals
 
-        return dict(output)
+    @property
+    def customer(self) -> str:
+        """Customer name without the country (e.g. 'OBI')."""
+        return self._customer
 
     @property
     def logger(self):
@@ -853,10 +933,36 @@ class Template(OrderedDict):
         return self._doclog
 
     @logger.setter
-    def logger(self, lgr: ExtLogger):
+    def logger(self, lgr: Logger):
         """Docuemnt logger."""
         self._doclog = lgr
 
+@lru_cache(maxsize = None)
+def _read_template_file(tpl_path: str, mtime: int) -> dict: # pylint: disable = W0613
+    """
+    Reads the contents of a template file. The contents are cached
+    per file path and modification time, so that a template file is
+    read and parsed again only if it was modified since the last reading.
+    """
+
+    with open(tpl_path, encoding = "utf-8") as stream:
+        return yaml.load(stream, Loader = SafeLoader)
+
+def _read_templates(templates_dir: str) -> dict:
+    """
+    Returns the contents of the template files stored in a directory.
+    Each file is parsed from YAML only if it was modified since it was
+    last read (see `_read_template_file()`).
+    """
+
+    # directory entries carry the stat info, which saves a stat call per file
+    with os.scandir(templates_dir) as entries:
+        return {
+            entry.name: _read_template_file(entry.path, entry.stat().st_mtime_ns)
+            for entry in entries
+            if entry.is_file() and entry.name.endswith((".yml", ".yaml"))
+        }
+
 class Extractor:
     """
     The class manages matching the document
@@ -864,8 +970,6 @@ class Extractor:
     data extraction from the document text.
     """
 
-    _templates = []
-
     _parsers = {
         "OBI": ObiParser,
         "MARKANT": MarkantParser,
@@ -873,41 +977,75 @@ class Extractor:
         "TOOM": ToomParser
     }
 
-    def __init__(self, issuer: str):
+    def __init__(self, issuer: str, templates_root: str = TEMPLATES_ROOT):
         """
         Creates a document data extractor for a specific customer.
 
         Params:
         -------
         issuer: Customer name and country (e.g. "OBI_DE")
+        templates_root: Path to the directory with the customer template directories.
         """
 
-        templates_dir = join(sys.path[0], "engine", "templates", issuer)
+        templates_dir = join(templates_root, issuer)
+        self._issuer = issuer
+        self._templates_root = templates_root
+        self._templates = []
+        self._templates_by_id = {}
+        self._parser_cache = {}
 
-        for tpl_path in os.listdir(templates_dir):
-            tpl = self._load_template(tpl_path)
+        for tpl_name, content in _read_templates(templates_dir).items():
+            tpl = self._load_template(tpl_name, content)
             self._templates.append(tpl)
+            self._templates_by_id[tpl["template_id"]] = tpl
 
-    def _load_template(self, tpl_path: str):
-
-        with open(tpl_path, encoding = "utf-8") as stream:
-            content = yaml.safe_load(stream)
+        # plain string keywords of all templates are searched
+        # for in a single pass over the document text
+        self._automaton = ahocorasick.Automaton()
 
-        tpl = Template(content)
-        tpl["name"] = splitext(basename(tpl_path))[0]
+        # the plain string inclusive keywords of each template, which
+        # rule out most templates with one set test per document
+        self._required_keywords = []
 
-        if "optional_fields" in tpl["fields"].keys():
+        for tpl in self._templates:
+            for literal in tpl.keyword_literals.values():
+                # keywords spelled differently may share one plain string
+                # (e.g. 'a\-b' and 'a-b'), so the string itself is stored
+                self._automaton.add_word(literal, literal)
+
+            self._required_keywords.append(frozenset(
+                tpl.keyword_literals[kwd] for kwd in tpl["inclusive_keywords"]
+                if kwd in tpl.keyword_literals
+            ))
+
+        if len(self._automaton) != 0:
+            self._automaton.make_automaton()
+
+    def _load_template(self, tpl_name: str, content: dict) -> Template:
+        """Loads a data extraction template from parsed template file contents."""
+
+        # the cached contents are shared by all extractors,
+        # so each template is created from its own copy
+        content = copy.deepcopy(content)
+        content["name"] = tpl_name.rpartition(".")[0]
+
+        # the contents are validated before the template is created,
+        # so that the template's patterns are compiled only once
+        if "optional_fields" in content["fields"].keys():
             raise KeyError("Field 'optional_fields' misplaced!")
 
         # Test if all required fields are in the correct place template:
-        if "inclusive_keywords" not in tpl.keys():
-            raise KeyError(f"Field 'inclusive_keywords' missing from template '{tpl['name']}'!")
+        if "inclusive_keywords" not in content.keys():
+            raise KeyError(f"Field 'inclusive_keywords' missing from template '{content['name']}'!")
 
         # Keywords as list, if only one.
-        if not isinstance(tpl["inclusive_keywords"], list):
-            tpl["inclusive_keywords"] = [tpl["inclusive_keywords"]]
+        if not isinstance(content["inclusive_keywords"], list):
+            content["inclusive_keywords"] = [content["inclusive_keywords"]]
+
+        if not isinstance(content.get("exclusive_keywords", []), list):
+            content["exclusive_keywords"] = [content["exclusive_keywords"]]
 
-        self._templates.append(Template(tpl))
+        return Template(content)
 
     def match_text(self, text: str) -> Union[str,None]:
         """
@@ -925,8 +1063,13 @@ class Extractor:
         otherwise `None`.
         """
 
-        for tpl in self._templates:
-            if tpl.matches_keywords(text):
+        if len(self._automaton) != 0:
+            found = {literal for _, literal in self._automaton.iter(text)}
+        else:
+            found = set()
+
+        for tpl, required in zip(self._templates, self._required_keywords):
+            if required <= found and tpl.matches_keywords(text, found):
                 return tpl["template_id"]
 
         return None
@@ -944,10 +1087,98 @@ class Extractor:
         Extracted data that consists of fields and the respective parameters.
         """
 
-        tmpl: Template = self._templates[templ_id]
-        customer = tmpl["issuer"].split("_")[0]
-        parser = self._parsers[customer](templ_id)
-        tmpl.logger = ExtLogger("document", log_path)
-        result = tmpl.extract(text, parser)
+        tmpl: Template = self._templates_by_id[templ_id]
+
+        # parsers keep no per-document state,
+        # so one parser serves each template
+        if templ_id not in self._parser_cache:
+            self._parser_cache[templ_id] = self._parsers[tmpl.customer](templ_id)
+
+        parser = self._parser_cache[templ_id]
+        doc_log = logger.get_logger("document", log_path)
+        tmpl.logger = doc_log
+
+        try:
+            result = tmpl.extract(text, parser)
+        finally:
+            logger.close_filehandler(doc_log)
 
         return result
+
+    def extract_many(self, documents: list) -> list:
+        """
+        Extracts relevant data from multiple document texts.
+
+        Params:
+        -------
+        documents: List of (text, templ_id, log_path) tuples, \n
+        where the arguments have the same meaning as in `extract()`.
+
+        Returns:
+        --------
+        Extracted data of each document, in the order of the input documents.
+        """
+
+        results = [None] * len(documents)
+
+        # documents of the same template are extracted one after another,
+        # so that they reuse the template's parser while it is still warm
+        order = sorted(range(len(documents)), key = lambda idx: documents[idx][1])
+
+        for idx in order:
+            text, templ_id, log_path = documents[idx]
+            results[idx] = self.extract(text, templ_id, log_path)
+
+        return results
+
+    def process_batch(self, documents: list, workers: int = None) -> list:
+        """
+        Matches and extracts multiple document texts in parallel processes.
+
+        Params:
+        -------
+        documents: List of (text, log_path) tuples, where `log_path` \n
+        is the path to the log file of the respective document.
+
+        workers: Number of worker processes. By default, \n
+        the number of processors on the machine is used.
+
+        Returns:
+        --------
+        Extracted data of each document, in the order of the input documents. \n
+        If a text matches none of the templates, then `None` is returned for it.
+        """
+
+        if workers is None:
+            workers = os.cpu_count()
+
+        # each worker loads the templates once and reuses
+        # them for all the documents it receives
+        with ProcessPoolExecutor(
+            max_workers = workers,
+            initializer = _init_worker,
+            initargs = (self._issuer, self._templates_root)) as executor:
+            chunk_size = max(1, len(documents) // (workers * 4))
+            results = list(executor.map(_process_document, documents, chunksize = chunk_size))
+
+        return results
+
+# extractor of a worker process, created by `_init_worker()`
+_worker_extractor = None
+
+def _init_worker(issuer: str, templates_root: str) -> None:
+    """Creates the extractor of a worker process."""
+
+    global _worker_extractor # pylint: disable = W0603
+    _worker_extractor = Extractor(issuer, templates_root)
+
+def _process_document(document: tuple) -> Union[dict,None]:
+    """Matches and extracts a document text in a worker process."""
+
+    text, log_path = document
+    templ_id = _worker_extractor.match_text(text)
+
+    if templ_id is None:
+        return None
+
+    return _worker_extractor.extract(text, templ_id, log_path)
@@ -0,0 +1,74 @@
+"""Tests for the document data extractor in doc/extractors.py."""
+
+import importlib
+import shutil
+import sys
+from os.path import dirname, join
+
+import pytest
+
+REPO_ROOT = dirname(dirname(__file__))
+
+TEMPLATE = """\
+issuer: TOOM_DE
+kind: credit
+name: Retoure
+template_id: 181001DE001
+
+inclusive_keywords:
+  - TOOM
+  - Retoure
+
+exclusive_keywords: Storno
+
+fields:
+  document_number: Beleg-Nr. (\\d+)
+  amount: Betrag ([\\d.,]+)
+"""
+
+@pytest.fixture(name = "extractors")
+def fixture_extractors(tmp_path, monkeypatch):
+    """
+    Imports doc/extractors.py as a module of a package that also
+    contains the application logger the module imports relatively.
+    """
+
+    pkg_dir = tmp_path / "docpkg"
+    pkg_dir.mkdir()
+    (pkg_dir / "__init__.py").write_text("", encoding = "utf-8")
+    shutil.copy(join(REPO_ROOT, "doc", "extractors.py"), pkg_dir / "extractors.py")
+    shutil.copy(join(REPO_ROOT, "app", "logger.py"), pkg_dir / "logger.py")
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield importlib.import_module("docpkg.extractors")
+
+    for name in ("docpkg.extractors", "docpkg.logger", "docpkg"):
+        sys.modules.pop(name, None)
+
+@pytest.fixture(name = "templates_root")
+def fixture_templates_root(tmp_path):
+    """Creates a templates directory with a single Toom template."""
+
+    tpl_dir = tmp_path / "templates" / "TOOM_DE"
+    tpl_dir.mkdir(parents = True)
+    (tpl_dir / "Retoure.yml").write_text(TEMPLATE, encoding = "utf-8")
+
+    return str(tmp_path / "templates")
+
+def test_process_batch_extracts_matched_documents(extractors, templates_root, tmp_path):
+    """A matched document is extracted and an unmatched one yields `None`."""
+
+    ext = extractors.Extractor("TOOM_DE", templates_root)
+    log_path = str(tmp_path / "document.log")
+
+    documents = [
+        ("TOOM Baumarkt\nRetoure\nBeleg-Nr. 4711\nBetrag 1.234,50\n", log_path),
+        ("TOOM Baumarkt\nRetoure Storno\nBeleg-Nr. 4712\nBetrag 10,00\n", log_path),
+    ]
+
+    results = ext.process_batch(documents, workers = 1)
+
+    assert results[1] is None
+    assert results[0]["template_id"] == "181001DE001"
+    assert results[0]["document_number"] == 4711
+    assert results[0]["amount"] == 1234.5